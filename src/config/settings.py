@@ -3,15 +3,36 @@ Configuration settings for Zoho Sprints MCP Server.
 """
 
 import os
+from dataclasses import dataclass
 from typing import Optional
 
+# Snapshot of the environment taken once at import; all settings read from this dict
+_env = os.environ.copy()
 
+
+@dataclass(frozen=True, slots=True)
 class Settings:
     """Application settings."""
     # Server Configuration
-    HOST: str = os.getenv("HOST", "0.0.0.0")
-    PORT: int = int(os.getenv("PORT", "8000"))
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    LOG_LEVEL: str = "INFO"
+    WORKERS: int = 1
+
+    # Zoho Sprints Configuration
+    ZOHO_CLIENT_ID: Optional[str] = None
+    ZOHO_CLIENT_SECRET: Optional[str] = None
+    ZOHO_AUTH_URL: str = "https://accounts.zoho.com/oauth/v2/token"
+    ZOHO_SPRINTS_BASE_URL: str = "https://sprintsapi.zoho.com/zsapi/team"
 
 # Global settings instance
-settings = Settings()
+settings = Settings(
+    HOST=_env.get("HOST", "0.0.0.0"),
+    PORT=int(_env.get("PORT", "8000")),
+    LOG_LEVEL=_env.get("LOG_LEVEL", "INFO"),
+    WORKERS=int(_env.get("WORKERS", "1")),
+    ZOHO_CLIENT_ID=_env.get("ZOHO_CLIENT_ID"),
+    ZOHO_CLIENT_SECRET=_env.get("ZOHO_CLIENT_SECRET"),
+    ZOHO_AUTH_URL=_env.get("ZOHO_AUTH_URL", "https://accounts.zoho.com/oauth/v2/token"),
+    ZOHO_SPRINTS_BASE_URL=_env.get("ZOHO_SPRINTS_BASE_URL", "https://sprintsapi.zoho.com/zsapi/team"),
+)
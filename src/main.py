@@ -3,11 +3,6 @@ Main entry point for the Zoho Sprints MCP Server.
 This file serves as the primary application entry point as required by AGENTS.md.
 """
 
-import sys
-import os
-
-# Add the src directory to Python path for proper imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 def main():
     """
@@ -18,12 +13,13 @@ def main():
     
     Usage:
         python main.py                    # Start HTTP server on 0.0.0.0:8000
+        zoho-sprints-mcp                  # Same, via the installed console script
     """
     # Start HTTP server by default
-    from mcp_streamable_http_server import StreamableHttpMCPServer
-    from config.settings import settings
+    # The module-level server is the one whose app uvicorn serves
+    from src.mcp_streamable_http_server import server
+    from src.config.settings import settings
     
-    server = StreamableHttpMCPServer(host=settings.HOST, port=settings.PORT)
     print(f"Starting Zoho Sprints HTTP MCP Server on {settings.HOST}:{settings.PORT}")
     server.run()
 
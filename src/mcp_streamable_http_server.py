@@ -3,44 +3,228 @@ MCP Server implementation using FastAPI for StreamableHttp transport.
 This server integrates with Zoho Sprints API to provide project management tools.
 """
 
-import json
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-import uvicorn
-from src.services.zoho_sprints import ZohoSprintsService
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Tuple, Union
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+import orjson
+from cachetools import TTLCache
 from src.utils.logger import logger
 from src.config.settings import settings
 
+if TYPE_CHECKING:
+    from src.services.zoho_sprints import ZohoSprintsService
 
-class MCPRequest(BaseModel):
-    """MCP request model."""
-    jsonrpc: str = "2.0"
-    id: Optional[int] = None
-    method: str
-    params: Optional[Dict[str, Any]] = None
 
+def _required_error(required: Tuple[str, ...]) -> str:
+    """Build the validation error reported when a tool's required arguments are missing."""
+    if len(required) == 1:
+        return f"{required[0]} is required"
+    if len(required) == 2:
+        return f"{required[0]} and {required[1]} are required"
+    return f"{', '.join(required[:-1])}, and {required[-1]} are required"
 
-class MCPResponse(BaseModel):
-    """MCP response model."""
-    jsonrpc: str = "2.0"
-    id: Optional[int] = None
-    result: Optional[Any] = None
-    error: Optional[Dict[str, Any]] = None
+
+# Tool name -> (required args, missing-args error, result key, not-found error).
+# Each tool calls the ZohoSprintsService method of the same name with the
+# required args in order; a not-found error of None marks a collection tool.
+_TOOL_TABLE: Dict[str, Tuple[Tuple[str, ...], str, str, Optional[str]]] = {
+    name: (required, _required_error(required) if required else "", result_key, not_found_error)
+    for name, required, result_key, not_found_error in (
+        ("get_projects", (), "projects", None),
+        ("get_project", ("project_id",), "project", "Project not found"),
+        ("get_sprints", ("project_id",), "sprints", None),
+        ("get_sprint", ("project_id", "sprint_id"), "sprint", "Sprint not found"),
+        ("get_items", ("project_id", "sprint_id_or_backlog_id"), "items", None),
+        ("get_item", ("project_id", "sprint_id_or_backlog_id", "item_id"), "item", "Item not found"),
+        ("get_epics", ("project_id",), "epics", None),
+        ("get_epic", ("project_id", "epic_id"), "epic", "Epic not found"),
+    )
+}
+
+
+def _parse_mcp_body(raw: bytes) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """Decode a JSON-RPC request body: one request object or a non-empty batch array of them."""
+    try:
+        body = orjson.loads(raw)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid JSON: {e}")
+    if isinstance(body, list) and not body:
+        raise HTTPException(status_code=422, detail="Batch must contain at least one request")
+    for item in body if isinstance(body, list) else (body,):
+        if not isinstance(item, dict) or not isinstance(item.get("method"), str):
+            raise HTTPException(status_code=422, detail="Request must be a JSON object with a string 'method'")
+        if not isinstance(item.get("params") or {}, dict):
+            raise HTTPException(status_code=422, detail="'params' must be a JSON object")
+    return body
+
+
+# Static tools/list schema, shared by every response
+_TOOLS: List[Dict[str, Any]] = [
+    {
+        "name": "get_projects",
+        "description": "Get all projects from Zoho Sprints",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    },
+    {
+        "name": "get_project",
+        "description": "Get a specific project by ID",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"}
+            },
+            "required": ["project_id"]
+        }
+    },
+    {
+        "name": "get_sprints",
+        "description": "Get all sprints for a project",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"}
+            },
+            "required": ["project_id"]
+        }
+    },
+    {
+        "name": "get_sprint",
+        "description": "Get a specific sprint by ID",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"},
+                "sprint_id": {"type": "string", "description": "Sprint ID"}
+            },
+            "required": ["project_id", "sprint_id"]
+        }
+    },
+    {
+        "name": "get_items",
+        "description": "Get items (stories, tasks, bugs) for a project sprint or backlog",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"},
+                "sprint_id_or_backlog_id": {"type": "string", "description": "Sprint ID or Backlog ID (required)"}
+            },
+            "required": ["project_id", "sprint_id_or_backlog_id"]
+        }
+    },
+    {
+        "name": "get_item",
+        "description": "Get a specific item by ID from a project sprint or backlog",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"},
+                "sprint_id_or_backlog_id": {"type": "string", "description": "Sprint ID or Backlog ID (required)"},
+                "item_id": {"type": "string", "description": "Item ID"}
+            },
+            "required": ["project_id", "sprint_id_or_backlog_id", "item_id"]
+        }
+    },
+    {
+        "name": "get_epics",
+        "description": "Get all epics for a project",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"}
+            },
+            "required": ["project_id"]
+        }
+    },
+    {
+        "name": "get_epic",
+        "description": "Get a specific epic by ID",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "project_id": {"type": "string", "description": "Project ID"},
+                "epic_id": {"type": "string", "description": "Epic ID"}
+            },
+            "required": ["project_id", "epic_id"]
+        }
+    }
+]
+
+# Seconds a failed login is remembered before the same credentials may try again
+AUTH_FAILURE_TTL = 30.0
+
+_CREDENTIAL_FIELDS = ("client_id", "client_secret", "auth_url", "base_url", "scopes")
+
+# Authenticated Zoho Sprints services shared across sessions, keyed by credentials. Bounded and
+# expiring, since clients choose the key: rotated credentials release their service and session
+_zoho_services: TTLCache = TTLCache(maxsize=256, ttl=3600)
+# Credentials whose login just failed -> error message, so retries fail fast instead of re-posting
+_zoho_auth_failures: TTLCache = TTLCache(maxsize=256, ttl=AUTH_FAILURE_TTL)
+# Credentials -> login currently in flight for them
+_zoho_auth_inflight: Dict[Tuple[str, ...], asyncio.Future] = {}
+
+
+async def _authenticate_service(key: Tuple[str, ...]) -> "ZohoSprintsService":
+    """Create and authenticate the service for one credentials key, recording the outcome."""
+    from src.services.zoho_sprints import ZohoSprintsService
+
+    service = ZohoSprintsService(**dict(zip(_CREDENTIAL_FIELDS, key)))
+    if not await service.authenticate():
+        _zoho_auth_failures[key] = "Failed to authenticate with Zoho Sprints API"
+        raise Exception(_zoho_auth_failures[key])
+    _zoho_services[key] = service
+    return service
+
+
+async def _get_zoho_service(credentials: Dict[str, Any]) -> "ZohoSprintsService":
+    """Return an authenticated Zoho Sprints service, authenticating once per process and credentials."""
+    key = tuple(credentials[name] for name in _CREDENTIAL_FIELDS)
+    service = _zoho_services.get(key)
+    if service is not None:
+        return service
+    failure = _zoho_auth_failures.get(key)
+    if failure is not None:
+        raise Exception(failure)
+
+    # Singleflight per credentials: concurrent first requests share one login, and a slow
+    # or failing login never holds up other credentials
+    task = _zoho_auth_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_authenticate_service(key))
+        _zoho_auth_inflight[key] = task
+        task.add_done_callback(lambda _: _zoho_auth_inflight.pop(key, None))
+    # Shield so one cancelled request does not cancel the login the others are awaiting
+    return await asyncio.shield(task)
 
 
 class StreamableHttpMCPServer:
     """MCP Server that communicates via StreamableHttp transport and integrates with Zoho Sprints."""
+
+    __slots__ = ("host", "port", "_tools_list_result", "_dispatch", "app")
     
-    def __init__(self, host: str = None, port: int = None):
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None):
         """Initialize the StreamableHttp MCP server."""
-        self.host = host or settings.HOST
-        self.port = port or settings.PORT
-        self.initialized = False
-        self.zoho_service = None
-        self.app = FastAPI(title="Zoho Sprints MCP Server", version="1.0.0")
+        self.host = host if host is not None else settings.HOST
+        self.port = port if port is not None else settings.PORT
+        # Serialized once; orjson embeds the fragment verbatim in every tools/list response
+        self._tools_list_result = orjson.Fragment(orjson.dumps({"tools": _TOOLS}))
+        # Bound handlers, all called as handler(credentials, params, request_id)
+        self._dispatch = {
+            "initialize": self.handle_initialize,
+            "tools/list": self.handle_tools_list,
+            "tools/call": self.handle_tools_call
+        }
+        self.app = FastAPI(
+            title="Zoho Sprints MCP Server",
+            version="1.0.0"
+        )
+        # Compress large tool results (e.g. get_items, get_projects); small replies stay uncompressed
+        self.app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
         self.setup_routes()
     
     def setup_routes(self):
@@ -71,8 +255,16 @@ class StreamableHttpMCPServer:
             }
         
         @self.app.post("/mcp")
-        async def handle_mcp_request(client_id: str, client_secret: str, auth_url: str, base_url: str, scopes: str, request: MCPRequest):
+        async def handle_mcp_request(client_id: str, client_secret: str, auth_url: str, base_url: str, scopes: str, request: Request):
             """Handle MCP requests via HTTP POST."""
+            body = _parse_mcp_body(await request.body())
+
+            # Notifications expect no JSON-RPC response; acknowledge before any dispatch work
+            messages = body if isinstance(body, list) else [body]
+            calls = [item for item in messages if not item["method"].startswith("notifications/")]
+            if not calls:
+                return Response(status_code=202)
+
             try:
                 credentials = {
                     "client_id": client_id,
@@ -81,30 +273,29 @@ class StreamableHttpMCPServer:
                     "base_url": base_url,
                     "scopes": scopes
                 }
-                response = await self.process_mcp_request(credentials, request)
-                return response
+                if isinstance(body, list):
+                    # JSON-RPC batch: run in order so e.g. initialize completes before tools/call
+                    response = [await self.process_mcp_request(credentials, call) for call in calls]
+                else:
+                    response = await self.process_mcp_request(credentials, body)
+                # Serializing with orjson directly skips FastAPI's jsonable_encoder pass and keeps Fragments intact
+                return Response(content=orjson.dumps(response), media_type="application/json")
             except Exception as e:
-                logger.error(f"Error processing MCP request: {str(e)}")
+                logger.error("Error processing MCP request: %s", e)
                 raise HTTPException(status_code=500, detail=str(e))
     
-    async def process_mcp_request(self, credentials: Dict[str, Any], request: MCPRequest) -> Dict[str, Any]:
+    async def process_mcp_request(self, credentials: Dict[str, Any], request: Dict[str, Any]) -> Dict[str, Any]:
         """Process MCP requests."""
-        method = request.method
-        params = request.params or {}
-        request_id = request.id
+        method = request["method"]
+        params = request.get("params") or {}
+        request_id = request.get("id")
         
-        logger.info(f"Processing MCP request: {method}")
+        logger.info("Processing MCP request: %s", method)
 
         try:
-            if method == "initialize":
-                return await self.handle_initialize(credentials, params, request_id)
-            elif method == "notifications/initialized":
-                logger.info("Received initialization notification")
-                return {"jsonrpc": "2.0", "id": request_id}
-            elif method == "tools/list":
-                return await self.handle_tools_list(params, request_id)
-            elif method == "tools/call":
-                return await self.handle_tools_call(params, request_id)
+            handler = self._dispatch.get(method)
+            if handler is not None:
+                return await handler(credentials, params, request_id)
             else:
                 return {
                     "jsonrpc": "2.0",
@@ -116,7 +307,7 @@ class StreamableHttpMCPServer:
                     }
                 }
         except Exception as e:
-            logger.error(f"Error processing request {method}: {str(e)}")
+            logger.error("Error processing request %s: %s", method, e)
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -132,25 +323,13 @@ class StreamableHttpMCPServer:
         logger.info("Initializing Zoho Sprints MCP server")
         
         try:
-            # Initialize Zoho Sprints service
-            self.zoho_service = ZohoSprintsService(
-                client_id=credentials["client_id"], 
-                client_secret=credentials["client_secret"], 
-                auth_url=credentials["auth_url"], 
-                base_url=credentials["base_url"], 
-                scopes=credentials["scopes"]
-            )
-            
-            # Authenticate with Zoho Sprints
-            auth_success = await self.zoho_service.authenticate()
-            if not auth_success:
-                raise Exception("Failed to authenticate with Zoho Sprints API")
-            
-            self.initialized = True
+            # Authenticate (or reuse the process-wide service) for these credentials; tools/call
+            # looks the service up again per request, so nothing is stored on the server
+            await _get_zoho_service(credentials)
 
             # Use the client's protocol version if available, otherwise default to 2024-11-05
             client_protocol_version = params.get("protocolVersion", "2024-11-05")
-            logger.info(f"Client protocol version: {client_protocol_version}")
+            logger.info("Client protocol version: %s", client_protocol_version)
             
             # Return server capabilities
             capabilities = {
@@ -174,7 +353,7 @@ class StreamableHttpMCPServer:
             }
             
         except Exception as e:
-            logger.error(f"Initialization failed: {str(e)}")
+            logger.error("Initialization failed: %s", e)
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -185,270 +364,147 @@ class StreamableHttpMCPServer:
                 }
             }
     
-    async def handle_tools_list(self, params: Dict[str, Any], request_id: int) -> Dict[str, Any]:
+    async def handle_tools_list(self, credentials: Dict[str, Any], params: Dict[str, Any], request_id: int) -> Dict[str, Any]:
         """Handle tools/list request."""
-        tools = [
-            {
-                "name": "get_projects",
-                "description": "Get all projects from Zoho Sprints",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            },
-            {
-                "name": "get_project",
-                "description": "Get a specific project by ID",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"}
-                    },
-                    "required": ["project_id"]
-                }
-            },
-            {
-                "name": "get_sprints",
-                "description": "Get all sprints for a project",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"}
-                    },
-                    "required": ["project_id"]
-                }
-            },
-            {
-                "name": "get_sprint",
-                "description": "Get a specific sprint by ID",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"},
-                        "sprint_id": {"type": "string", "description": "Sprint ID"}
-                    },
-                    "required": ["project_id", "sprint_id"]
-                }
-            },
-            {
-                "name": "get_items",
-                "description": "Get items (stories, tasks, bugs) for a project sprint or backlog",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"},
-                        "sprint_id_or_backlog_id": {"type": "string", "description": "Sprint ID or Backlog ID (required)"}
-                    },
-                    "required": ["project_id", "sprint_id_or_backlog_id"]
-                }
-            },
-            {
-                "name": "get_item",
-                "description": "Get a specific item by ID from a project sprint or backlog",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"},
-                        "sprint_id_or_backlog_id": {"type": "string", "description": "Sprint ID or Backlog ID (required)"},
-                        "item_id": {"type": "string", "description": "Item ID"}
-                    },
-                    "required": ["project_id", "sprint_id_or_backlog_id", "item_id"]
-                }
-            },
-
-            {
-                "name": "get_epics",
-                "description": "Get all epics for a project",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"}
-                    },
-                    "required": ["project_id"]
-                }
-            },
-            {
-                "name": "get_epic",
-                "description": "Get a specific epic by ID",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "project_id": {"type": "string", "description": "Project ID"},
-                        "epic_id": {"type": "string", "description": "Epic ID"}
-                    },
-                    "required": ["project_id", "epic_id"]
-                }
-            }
-        ]
-        
         return {
             "jsonrpc": "2.0",
             "id": request_id,
-            "result": {"tools": tools}
+            "result": self._tools_list_result
         }
     
-    async def handle_tools_call(self, params: Dict[str, Any], request_id: int) -> Dict[str, Any]:
+    async def handle_tools_call(self, credentials: Dict[str, Any], params: Dict[str, Any], request_id: int) -> Dict[str, Any]:
         """Handle tools/call request."""
-        if not self.initialized or not self.zoho_service:
+        # Every request carries its credentials, so each client gets its own tenant's service,
+        # even if initialize ran in another worker process or another client initialized since
+        try:
+            zoho_service = await _get_zoho_service(credentials)
+        except Exception as e:
+            logger.error("Zoho authentication failed: %s", e)
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "error": {
                     "code": -32603,
-                    "message": "Server not initialized",
-                    "data": "Call initialize() first"
+                    "message": "Authentication failed",
+                    "data": str(e)
                 }
             }
         
-        logger.info(f"Tools call params: {params}")
+        # Dumping the raw params and calls repr()s whole dicts, so only do it at DEBUG
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Tools call params: %s", params)
         tool_calls = params.get("toolCalls", params.get("calls", params.get("tool_calls", [])))
         
         # If no toolCalls array found, check if the tool call is directly in params
         if not tool_calls and "name" in params:
             tool_calls = [params]
             
-        logger.info(f"Tool calls extracted: {tool_calls}")
-        results = []
-        
-        for tool_call in tool_calls:
-            tool_name = tool_call.get("name")
-            tool_args = tool_call.get("arguments", {})
-            
-            logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-            
-            try:
-                result = await self._execute_zoho_tool(tool_name, tool_args)
-                
-                # Format the result
-                if "error" not in result:
-                    results.append({
-                        "name": tool_name,
-                        "content": [{
-                            "type": "text",
-                            "text": json.dumps(result, indent=2)
-                        }]
-                    })
-                else:
-                    results.append({
-                        "name": tool_name,
-                        "content": [{
-                            "type": "text",
-                            "text": f"Error: {result.get('error', 'Unknown error')}"
-                        }]
-                    })
-                
-            except Exception as e:
-                logger.error(f"Error executing tool {tool_name}: {str(e)}")
-                results.append({
-                    "name": tool_name,
-                    "content": [{
-                        "type": "text",
-                        "text": f"Error: {str(e)}"
-                    }]
-                })
-        
-        # Return results in the format expected by MCP clients
-        if len(results) == 1:
-            single_result = results[0]
+        if debug:
+            logger.debug("Tool calls extracted: %s", tool_calls)
+
+        # Single call (the common case): the formatted call is the result itself
+        if len(tool_calls) == 1:
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
-                "result": {
-                    "name": single_result["name"],
-                    "content": single_result["content"]
-                }
+                "result": await self._call_tool(zoho_service, tool_calls[0])
             }
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "calls": results
-                }
+
+        # Independent Zoho calls run concurrently; gather preserves call order
+        results = await asyncio.gather(*(self._call_tool(zoho_service, tool_call) for tool_call in tool_calls))
+        
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "calls": list(results)
             }
+        }
     
-    async def _execute_zoho_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a Zoho Sprints tool."""
+    async def _call_tool(self, zoho_service: "ZohoSprintsService", tool_call: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one tool call and format it as MCP text content."""
+        tool_name = tool_call.get("name")
+        tool_args = tool_call.get("arguments", {})
+        
+        logger.info("Executing tool: %s with args: %s", tool_name, tool_args)
+        
         try:
-            if tool_name == "get_projects":
-                logger.info("Executing get_projects tool~~~~")
-                projects = await self.zoho_service.get_projects()
-                return {"projects": projects, "count": len(projects)}
-                
-            elif tool_name == "get_project":
-                project_id = tool_args.get("project_id")
-                if not project_id:
-                    return {"error": "project_id is required"}
-                project = await self.zoho_service.get_project(project_id)
-                return {"project": project} if project else {"error": "Project not found"}
-                
-            elif tool_name == "get_sprints":
-                project_id = tool_args.get("project_id")
-                if not project_id:
-                    return {"error": "project_id is required"}
-                sprints = await self.zoho_service.get_sprints(project_id)
-                return {"sprints": sprints, "count": len(sprints)}
-                
-            elif tool_name == "get_sprint":
-                project_id = tool_args.get("project_id")
-                sprint_id = tool_args.get("sprint_id")
-                if not project_id or not sprint_id:
-                    return {"error": "project_id and sprint_id are required"}
-                sprint = await self.zoho_service.get_sprint(project_id, sprint_id)
-                return {"sprint": sprint} if sprint else {"error": "Sprint not found"}
-                
-            elif tool_name == "get_items":
-                project_id = tool_args.get("project_id")
-                sprint_id_or_backlog_id = tool_args.get("sprint_id_or_backlog_id")
-                if not project_id or not sprint_id_or_backlog_id:
-                    return {"error": "project_id and sprint_id_or_backlog_id are required"}
-                items = await self.zoho_service.get_items(project_id, sprint_id_or_backlog_id)
-                return {"items": items, "count": len(items)}
-                
-            elif tool_name == "get_item":
-                project_id = tool_args.get("project_id")
-                sprint_id_or_backlog_id = tool_args.get("sprint_id_or_backlog_id")
-                item_id = tool_args.get("item_id")
-                if not project_id or not sprint_id_or_backlog_id or not item_id:
-                    return {"error": "project_id, sprint_id_or_backlog_id, and item_id are required"}
-                item = await self.zoho_service.get_item(project_id, sprint_id_or_backlog_id, item_id)
-                return {"item": item} if item else {"error": "Item not found"}
-                
-            elif tool_name == "get_epics":
-                project_id = tool_args.get("project_id")
-                if not project_id:
-                    return {"error": "project_id is required"}
-                epics = await self.zoho_service.get_epics(project_id)
-                return {"epics": epics, "count": len(epics)}
-                
-            elif tool_name == "get_epic":
-                project_id = tool_args.get("project_id")
-                epic_id = tool_args.get("epic_id")
-                if not project_id or not epic_id:
-                    return {"error": "project_id and epic_id are required"}
-                epic = await self.zoho_service.get_epic(project_id, epic_id)
-                return {"epic": epic} if epic else {"error": "Epic not found"}
-                
+            result = await self._execute_zoho_tool(zoho_service, tool_name, tool_args)
+            
+            # Format the result
+            if "error" not in result:
+                text = orjson.dumps(result, option=orjson.OPT_INDENT_2).decode()
             else:
-                return {"error": f"Unknown tool: {tool_name}"}
-                
+                text = f"Error: {result.get('error', 'Unknown error')}"
+            
+        except Exception as e:
+            logger.error("Error executing tool %s: %s", tool_name, e)
+            text = f"Error: {str(e)}"
+        
+        return {
+            "name": tool_name,
+            "content": [{
+                "type": "text",
+                "text": text
+            }]
+        }
+    
+    async def _execute_zoho_tool(self, zoho_service: "ZohoSprintsService", tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a Zoho Sprints tool."""
+        entry = _TOOL_TABLE.get(tool_name)
+        if entry is None:
+            return {"error": f"Unknown tool: {tool_name}"}
+        required, missing_error, result_key, not_found_error = entry
+
+        if not all(tool_args.get(arg) for arg in required):
+            return {"error": missing_error}
+
+        try:
+            handler = getattr(zoho_service, tool_name)
+            result = await handler(*[tool_args[arg] for arg in required])
+
+            # Collection tools report a count; single-resource tools report "not found"
+            if not_found_error is None:
+                return {result_key: result, "count": len(result)}
+            return {result_key: result} if result else {"error": not_found_error}
+
         except Exception as e:
-            logger.error(f"Error executing Zoho tool {tool_name}: {str(e)}")
+            logger.error("Error executing Zoho tool %s: %s", tool_name, e)
             return {"error": str(e)}
     
     def run(self):
         """Run the StreamableHttp MCP server."""
-        logger.info(f"Starting Zoho Sprints MCP Server (StreamableHttp mode) on {self.host}:{self.port}")
+        logger.info("Starting Zoho Sprints MCP Server (StreamableHttp mode) on %s:%s", self.host, self.port)
         logger.info("Using FastAPI framework")
         
+        import uvicorn
+
+        # uvicorn can only fork workers from an import string; each worker then
+        # imports its own module-level server
+        workers = settings.WORKERS
+        app = "src.mcp_streamable_http_server:app" if workers > 1 else self.app
+
         # Run the server using uvicorn
-        uvicorn.run(self.app, host=self.host, port=self.port, log_level="info")
+        uvicorn.run(
+            app,
+            host=self.host,
+            port=self.port,
+            workers=workers,
+            log_level="info",
+            loop="uvloop",
+            http="httptools",
+            access_log=False
+        )
+
+
+# Module-level server and ASGI app, e.g. `uvicorn src.mcp_streamable_http_server:app --workers N`
+server = StreamableHttpMCPServer()
+app = server.app
 
 
 def main():
     """Main entry point for the StreamableHttp MCP server."""
-    server = StreamableHttpMCPServer()
     server.run()
 
 
@@ -3,14 +3,28 @@ Zoho Sprints API service module.
 Handles authentication and API calls to Zoho Sprints.
 """
 
+import asyncio
 import logging
+import time
 import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Inside this window before expiry the token is "stale": still used, but refreshed in the background
+TOKEN_REFRESH_BUFFER = 300.0
+# Treat the token as expired this many seconds early to absorb request latency
+TOKEN_EXPIRY_SAFETY = 60.0
+# After a failed background refresh, wait this long before the stale window may try again
+REFRESH_RETRY_COOLDOWN = 30.0
+# Max projects fetched at once by get_all_snapshots, to stay within Zoho rate limits
+SNAPSHOT_CONCURRENCY = 10
+
 
 class ZohoSprintsService:
     """Service class for interacting with Zoho Sprints API."""
@@ -23,10 +37,51 @@ class ZohoSprintsService:
         self.access_token = None
         self.refresh_token = None
         self.token_expires_at = None
+        self._cached_headers: Optional[Dict[str, str]] = None
+        # Deadlines on the time.monotonic() clock, immune to wall-clock jumps
+        self._token_expires_monotonic: Optional[float] = None
+        self._token_refresh_monotonic: Optional[float] = None
+        self._auth_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_failed_monotonic: Optional[float] = None
         self.base_url = base_url
         self.auth_url = auth_url
         self.base_url = base_url
         self.scopes = scopes
+
+        # Pooled keep-alive session so API calls reuse TCP/TLS connections. requests
+        # is blocking, so calls run in worker threads to keep the event loop free.
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            # Transient 429/5xx responses are retried inside urllib3, honouring Retry-After
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "POST"],
+                respect_retry_after_header=True
+            )
+        ))
+
+        # URLs (with mandatory parameters per Zoho Sprints API docs) pre-joined with
+        # base_url once; per-call work is a single str.format
+        self._projects_url = f"{base_url}/projects/?action=allprojects&index=1&range=50"
+        self._project_url = f"{base_url}/projects/{{pid}}/?action=details"
+        self._sprints_url = f"{base_url}/projects/{{pid}}/sprints/?action=data&index=1&range=100&type=%5B2%5D"
+        self._sprint_url = f"{base_url}/projects/{{pid}}/sprints/{{sid}}/?action=details"
+        self._items_url = f"{base_url}/projects/{{pid}}/sprints/{{sid}}/item/?action=data&index=1&range=100"
+        self._item_url = f"{base_url}/projects/{{pid}}/sprints/{{sid}}/item/{{iid}}/?action=details"
+        self._epics_url = f"{base_url}/projects/{{pid}}/epic/?action=data&index=1&range=100"
+        self._epic_url = f"{base_url}/projects/{{pid}}/epic/{{eid}}/?action=details"
+
+        # url -> (ETag, Last-Modified, parsed body) for conditional revalidation of list endpoints
+        self._response_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+        # url -> parsed body for single-resource endpoints, served without a request while fresh
+        self._resource_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+        # url -> fetch currently in flight for it
+        self._inflight: Dict[str, asyncio.Future] = {}
         
     async def authenticate(self) -> bool:
         """Authenticate with Zoho Sprints API using client credentials."""
@@ -39,123 +94,198 @@ class ZohoSprintsService:
                 "scope": self.scopes
             }
             
-            logger.info(f"Attempting authentication with Zoho...")
-            logger.info(f"Auth URL: {self.auth_url}")
-            logger.info(f"Client ID: {self.client_id[:10]}...")
-            logger.info(f"Scope: {self.scopes}")
-            
-            response = requests.post(self.auth_url, data=auth_data)
-            logger.info(f"Auth response status: {response.status_code}")
-            logger.info(f"Auth response: {response.text[:500]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Attempting authentication with Zoho...")
+                logger.debug("Auth URL: %s", self.auth_url)
+                logger.debug("Client ID: %s...", self.client_id[:10])
+                logger.debug("Scope: %s", self.scopes)
+            
+            # Drop the session's API headers: the token endpoint takes a form body and no bearer token
+            response = await asyncio.to_thread(
+                self._session.post,
+                self.auth_url,
+                data=auth_data,
+                headers={"Authorization": None, "Content-Type": None}
+            )
+            logger.debug("Auth response status: %s", response.status_code)
             
             response.raise_for_status()
             
-            token_data = response.json()
-            self.access_token = token_data.get("access_token")
+            # Validate before touching any state, so a bad response leaves the current token in use
+            token_data = self._parse(response)
+            access_token = token_data.get("access_token")
+            if not access_token:
+                raise ValueError("Token response did not include an access_token")
+            self.access_token = access_token
             self.refresh_token = token_data.get("refresh_token")
             
+            # Every API request on the session carries the new token
+            self._cached_headers = None
+            self._session.headers.update(self._get_headers())
+            
             # Set token expiration (default to 1 hour if not provided)
             expires_in = token_data.get("expires_in", 3600)
+            now = time.monotonic()
             self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
+            self._token_expires_monotonic = now + expires_in - min(TOKEN_EXPIRY_SAFETY, expires_in / 2)
+            self._token_refresh_monotonic = now + expires_in - min(TOKEN_REFRESH_BUFFER, expires_in / 2)
             
             logger.info("Successfully authenticated with Zoho Sprints API")
-            logger.info(f"Access token: {self.access_token[:20] if self.access_token else 'None'}...")
             return True
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Authentication failed: {str(e)}")
+            logger.error("Authentication failed: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error during authentication: {str(e)}")
+            logger.error("Unexpected error during authentication: %s", e)
             return False
     
+    @staticmethod
+    def _parse(response: requests.Response) -> Any:
+        """Decode a JSON response body with orjson."""
+        return orjson.loads(response.content)
+    
     def _get_headers(self) -> Dict[str, str]:
-        """Get headers for API requests."""
-        if not self.access_token:
-            raise ValueError("Not authenticated. Call authenticate() first.")
-        
-        return {
-            "Authorization": f"Zoho-oauthtoken {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        """Get headers for API requests, built once per access token."""
+        if self._cached_headers is None:
+            if not self.access_token:
+                raise ValueError("Not authenticated. Call authenticate() first.")
+            
+            self._cached_headers = {
+                "Authorization": f"Zoho-oauthtoken {self.access_token}",
+                "Content-Type": "application/json"
+            }
+        return self._cached_headers
     
     def _is_token_expired(self) -> bool:
         """Check if the access token is expired."""
-        if not self.token_expires_at:
+        if self._token_expires_monotonic is None:
             return True
-        return datetime.now() >= self.token_expires_at
+        return time.monotonic() >= self._token_expires_monotonic
+    
+    def _needs_refresh(self) -> bool:
+        """Check if the access token is missing or inside its refresh buffer."""
+        if self._token_refresh_monotonic is None:
+            return True
+        return time.monotonic() >= self._token_refresh_monotonic
     
     async def _ensure_authenticated(self) -> bool:
         """Ensure we have a valid access token."""
-        if self._is_token_expired():
-            logger.info("Access token expired, re-authenticating...")
-            return await self.authenticate()
-        return True
+        # Fresh: nothing to do
+        if not self._needs_refresh():
+            return True
+        
+        # Stale but still valid: keep serving the current token while one background refresh runs
+        if not self._is_token_expired():
+            if (self._refresh_task is None or self._refresh_task.done()) and not self._in_refresh_cooldown():
+                self._refresh_task = asyncio.create_task(self._refresh_token())
+            return True
+        
+        # Expired (or never authenticated): the caller has to wait for a new token
+        return await self._refresh_token()
     
-    async def get_projects(self) -> List[Dict[str, Any]]:
-        """Get all projects from Zoho Sprints."""
-        try:            
+    async def _refresh_token(self) -> bool:
+        """Re-authenticate unless another coroutine already refreshed the token."""
+        async with self._auth_lock:
+            if not self._needs_refresh():
+                return True
+            logger.info("Access token expiring, re-authenticating...")
+            refreshed = await self.authenticate()
+            self._refresh_failed_monotonic = None if refreshed else time.monotonic()
+            return refreshed
+    
+    def _in_refresh_cooldown(self) -> bool:
+        """Check if a refresh failed less than REFRESH_RETRY_COOLDOWN seconds ago."""
+        if self._refresh_failed_monotonic is None:
+            return False
+        return time.monotonic() < self._refresh_failed_monotonic + REFRESH_RETRY_COOLDOWN
+    
+    async def _cached_get(self, url: str) -> Any:
+        """GET a JSON resource, revalidating any cached copy with If-None-Match/If-Modified-Since."""
+        cached = self._response_cache.get(url)
+        headers = {}
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        
+        response = await asyncio.to_thread(self._session.get, url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            return cached[2]
+        response.raise_for_status()
+        
+        body = self._parse(response)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._response_cache[url] = (etag, last_modified, body)
+        return body
+    
+    async def _get(self, url: str, default: Any, revalidate: bool = False, cache: bool = False) -> Any:
+        """GET and decode a Zoho Sprints resource, returning default on any failure.
+        
+        Args:
+            url: Fully built API URL
+            default: Value returned when authentication or the request fails
+            revalidate: Use the ETag/Last-Modified cache (for list endpoints)
+            cache: Serve from the short-lived TTL cache (for single-resource endpoints)
+        """
+        if cache:
+            cached = self._resource_cache.get(url)
+            if cached is not None:
+                return cached
+        
+        # Singleflight: concurrent callers for the same URL share one in-flight fetch
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url, default, revalidate, cache))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # Shield so one cancelled caller does not cancel the fetch the others are awaiting
+        return await asyncio.shield(task)
+    
+    async def _fetch(self, url: str, default: Any, revalidate: bool, cache: bool) -> Any:
+        """Perform the GET behind _get; see _get for the arguments."""
+        try:
             if not await self._ensure_authenticated():
-                return []
+                return default
+            
+            if revalidate:
+                return await self._cached_get(url)
             
-            url = f"{self.base_url}/projects/?action=allprojects&index=1&range=50"            
-            headers = self._get_headers()            
-            response = requests.get(url, headers=headers)            
+            response = await asyncio.to_thread(self._session.get, url)
             response.raise_for_status()
             
-            return response.json()
+            body = self._parse(response)
+            if cache and body:
+                self._resource_cache[url] = body
+            return body
             
         except Exception as e:
-            logger.error(f"Error fetching projects: {str(e)}")
-            return []
+            logger.error("Error fetching %s: %s", url, e)
+            return default
+    
+    async def get_projects(self) -> List[Dict[str, Any]]:
+        """Get all projects from Zoho Sprints."""
+        return await self._get(self._projects_url, [], revalidate=True)
     
     async def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific project by ID."""
-        try:
-            if not await self._ensure_authenticated():
-                return None
-            
-            url = f"{self.base_url}/projects/{project_id}/?action=details"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except Exception as e:
-            logger.error(f"Error fetching project {project_id}: {str(e)}")
-            return None
+        return await self._get(self._project_url.format(pid=project_id), None, cache=True)
     
     async def get_sprints(self, project_id: str) -> List[Dict[str, Any]]:
         """Get all sprints for a project."""
-        try:
-            if not await self._ensure_authenticated():
-                return []
-            
-            url = f"{self.base_url}/projects/{project_id}/sprints/?action=data&index=1&range=100&type=%5B2%5D"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except Exception as e:
-            logger.error(f"Error fetching sprints for project {project_id}: {str(e)}")
-            return None
+        return await self._get(self._sprints_url.format(pid=project_id), [], revalidate=True)
+    
+    async def get_sprints_for_projects(self, project_ids: List[str]) -> List[List[Dict[str, Any]]]:
+        """Get the sprints of several projects concurrently, in the order of project_ids."""
+        return list(await asyncio.gather(*(self.get_sprints(project_id) for project_id in project_ids)))
     
     async def get_sprint(self, project_id: str, sprint_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific sprint by ID."""
-        try:
-            if not await self._ensure_authenticated():
-                return None
-            
-            url = f"{self.base_url}/projects/{project_id}/sprints/{sprint_id}/?action=details"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except Exception as e:
-            logger.error(f"Error fetching sprint {sprint_id}: {str(e)}")
-            return None
+        return await self._get(self._sprint_url.format(pid=project_id, sid=sprint_id), None, cache=True)
     
     async def get_items(self, project_id: str, sprint_id_or_backlog_id: str) -> List[Dict[str, Any]]:
         """Get items from a project in Zoho Sprints.
@@ -167,22 +297,7 @@ class ZohoSprintsService:
         Returns:
             List of items from the project/sprint/backlog
         """
-        try:
-            if not await self._ensure_authenticated():
-                return []
-            
-            # Build URL with mandatory parameters per Zoho Sprints API docs
-            url = f"{self.base_url}/projects/{project_id}/sprints/{sprint_id_or_backlog_id}/item/?action=data&index=1&range=100"
-            
-            headers = self._get_headers()
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except Exception as e:
-            logger.error(f"Error fetching items: {str(e)}")
-            return []
+        return await self._get(self._items_url.format(pid=project_id, sid=sprint_id_or_backlog_id), [])
     
     async def get_item(self, project_id: str, sprint_id_or_backlog_id: str, item_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific item by ID from Zoho Sprints.
@@ -195,21 +310,7 @@ class ZohoSprintsService:
         Returns:
             Item details or None if not found
         """
-        try:
-            if not await self._ensure_authenticated():
-                return None
-            
-            # Build URL with mandatory parameters per Zoho Sprints API docs
-            url = f"{self.base_url}/projects/{project_id}/sprints/{sprint_id_or_backlog_id}/item/{item_id}/?action=details"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except Exception as e:
-            logger.error(f"Error fetching item {item_id}: {str(e)}")
-            return None
-        
+        return await self._get(self._item_url.format(pid=project_id, sid=sprint_id_or_backlog_id, iid=item_id), None, cache=True)
     
     async def get_epics(self, project_id: str) -> List[Dict[str, Any]]:
         """Get all epics for a project from Zoho Sprints.
@@ -220,20 +321,7 @@ class ZohoSprintsService:
         Returns:
             List of epics from the project
         """
-        try:
-            if not await self._ensure_authenticated():
-                return []
-            
-            # Build URL with mandatory parameters per Zoho Sprints API docs
-            url = f"{self.base_url}/projects/{project_id}/epic/?action=data&index=1&range=100"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except Exception as e:
-            logger.error(f"Error fetching epics for project {project_id}: {str(e)}")
-            return []
+        return await self._get(self._epics_url.format(pid=project_id), [], revalidate=True)
     
     async def get_epic(self, project_id: str, epic_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific epic by ID from Zoho Sprints.
@@ -245,17 +333,33 @@ class ZohoSprintsService:
         Returns:
             Epic details or None if not found
         """
-        try:
-            if not await self._ensure_authenticated():
-                return None
-            
-            # Build URL with mandatory parameters per Zoho Sprints API docs
-            url = f"{self.base_url}/projects/{project_id}/epic/{epic_id}/?action=details"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            return response.json()
+        return await self._get(self._epic_url.format(pid=project_id, eid=epic_id), None, cache=True)
+    
+    async def get_project_snapshot(self, project_id: str) -> Dict[str, Any]:
+        """Get the sprints and epics of a project concurrently.
+        
+        Args:
+            project_id: The ID of the project (required)
             
-        except Exception as e:
-            logger.error(f"Error fetching epic {epic_id}: {str(e)}")
-            return None
+        Returns:
+            Dict with the project_id and its sprints and epics
+        """
+        sprints, epics = await asyncio.gather(self.get_sprints(project_id), self.get_epics(project_id))
+        return {"project_id": project_id, "sprints": sprints, "epics": epics}
+    
+    async def get_all_snapshots(self) -> List[Dict[str, Any]]:
+        """Get a snapshot of every project, at most SNAPSHOT_CONCURRENCY projects at a time.
+        
+        Returns:
+            List of project snapshots, in the order Zoho lists the projects
+        """
+        projects = await self.get_projects()
+        # The allprojects response lists project IDs under "projectIds"
+        project_ids = projects.get("projectIds", []) if isinstance(projects, dict) else []
+        semaphore = asyncio.Semaphore(SNAPSHOT_CONCURRENCY)
+        
+        async def snapshot(project_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.get_project_snapshot(project_id)
+        
+        return list(await asyncio.gather(*(snapshot(project_id) for project_id in project_ids)))
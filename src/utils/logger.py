@@ -2,10 +2,28 @@
 Logging configuration for the Zoho Sprints MCP Server.
 """
 
+import atexit
 import logging
-import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+from src.config.settings import settings
+
+# Default level, resolved once from the LOG_LEVEL setting
+_RESOLVED_LEVEL = getattr(logging, settings.LOG_LEVEL.upper())
+
+# Loggers only enqueue records; a background listener thread formats and writes them
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_console_handler = logging.StreamHandler()
+_console_handler.setLevel(logging.DEBUG)  # Set handler to DEBUG to see all messages
+_console_handler.setFormatter(logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+))
+_listener = QueueListener(_log_queue, _console_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
 
 def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
     """
@@ -19,27 +37,21 @@ def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
         Configured logger instance
     """
     logger = logging.getLogger(name)
+    log_level = getattr(logging, level.upper()) if level else _RESOLVED_LEVEL
+    
+    # Already configured at this level: nothing to do
+    if logger.handlers and logger.level == log_level:
+        return logger
     
     # Set log level
-    log_level = level or os.getenv("LOG_LEVEL", "INFO")
-    logger.setLevel(getattr(logging, log_level.upper()))
+    logger.setLevel(log_level)
     
     # Ensure logger propagates to root logger
     logger.propagate = True
     
-    # Create console handler if none exists
+    # Route records through the shared queue if no handler exists
     if not logger.handlers:
-        handler = logging.StreamHandler()
-        handler.setLevel(logging.DEBUG)  # Set handler to DEBUG to see all messages
-        
-        # Create formatter
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        handler.setFormatter(formatter)
-        
-        # Add handler to logger
-        logger.addHandler(handler)
+        logger.addHandler(QueueHandler(_log_queue))
     
     return logger
 
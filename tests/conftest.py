@@ -0,0 +1,30 @@
+"""
+Shared pytest configuration for the Zoho Sprints MCP server tests.
+"""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    """Add the --live opt-in for tests that need a running server."""
+    parser.addoption(
+        "--live",
+        action="store_true",
+        default=False,
+        help="run tests marked live against a server on localhost:8000"
+    )
+
+
+def pytest_configure(config):
+    """Register the live marker."""
+    config.addinivalue_line("markers", "live: tests that require a running server on localhost:8000")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip live tests unless --live was given, so no test waits on a connect timeout."""
+    if config.getoption("--live"):
+        return
+    skip_live = pytest.mark.skip(reason="needs a running server on localhost:8000; pass --live to run")
+    for item in items:
+        if "live" in item.keywords:
+            item.add_marker(skip_live)
@@ -2,279 +2,354 @@
 Tests for the Zoho Sprints StreamableHttp MCP server.
 """
 
+import asyncio
+import time
 import pytest
+import orjson
 import requests
-import json
-import time
-import os
+from unittest.mock import patch
+from urllib.parse import parse_qsl, urlencode
+from fastapi.testclient import TestClient
+
+server_module = pytest.importorskip("src.mcp_streamable_http_server")
+zoho_module = pytest.importorskip("src.services.zoho_sprints")
+StreamableHttpMCPServer = server_module.StreamableHttpMCPServer
+Settings = pytest.importorskip("src.config.settings").Settings
+
+# Address of a running server (e.g. the docker compose container), used only by live tests
+BASE_URL = "http://localhost:8000"
+
+# /mcp takes the Zoho credentials as query parameters
+MCP_URL = "/mcp?" + urlencode({
+    "client_id": "test_client_id",
+    "client_secret": "test_client_secret",
+    "auth_url": "https://accounts.zoho.com/oauth/v2/token",
+    "base_url": "https://sprintsapi.zoho.com/zsapi/team",
+    "scopes": "ZohoSprints.projects.READ",
+})
+
+
+@pytest.fixture(scope="session")
+def client():
+    """In-process ASGI client for the module-level app; no socket or running server needed."""
+    with TestClient(server_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def zoho_offline():
+    """Stub Zoho authentication and fetches so initialize and tools/call never leave the process."""
+    async def authenticate(service):
+        service.access_token = "test_access_token"
+        return True
+
+    async def fetch(service, url, default, revalidate, cache):
+        return default
+
+    with patch.object(zoho_module.ZohoSprintsService, "authenticate", authenticate), \
+            patch.object(zoho_module.ZohoSprintsService, "_fetch", fetch):
+        yield
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def j(response):
+    """Decode a response body with orjson rather than the stdlib json behind response.json()."""
+    return orjson.loads(response.content)
+
+
+def rpc_batch(client, payload):
+    """POST a pre-encoded JSON-RPC batch array and return the decoded response array."""
+    response = client.post(MCP_URL, content=payload, headers=JSON_HEADERS)
+    assert response.status_code == 200
+    return j(response)
+
+
+INIT_PARAMS = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {},
+    "clientInfo": {
+        "name": "test-client",
+        "version": "1.0.0"
+    }
+}
 
+# Static request bodies, serialized once at import. Templates take the request id via %d
+# so the nested params are never re-serialized.
+_INIT_TEMPLATE = '{"jsonrpc": "2.0", "id": %d, "method": "initialize", "params": ' + orjson.dumps(INIT_PARAMS).decode() + '}'
+_TOOLS_CALL_TEMPLATE = (
+    '{"jsonrpc": "2.0", "id": %d, "method": "tools/call", "params": '
+    + orjson.dumps({"calls": [{"name": "get_projects", "arguments": {}}]}).decode() + '}'
+)
+_TOOLS_CALL_PAYLOAD = (_TOOLS_CALL_TEMPLATE % 3).encode()
+_INIT_THEN_CALL_PAYLOAD = ("[" + _INIT_TEMPLATE % 4 + ", " + _TOOLS_CALL_TEMPLATE % 5 + "]").encode()
+_NOTIFICATION_PAYLOAD = orjson.dumps({"jsonrpc": "2.0", "id": 7, "method": "notifications/initialized", "params": {}})
+_MULTI_CALL_PAYLOAD = orjson.dumps({"jsonrpc": "2.0", "id": 9, "method": "tools/call", "params": {"calls": [
+    {"name": "get_projects", "arguments": {}},
+    {"name": "get_project", "arguments": {}},
+    {"name": "get_epics", "arguments": {"project_id": "1"}},
+]}})
+_GET_ITEMS_PAYLOAD = orjson.dumps({"jsonrpc": "2.0", "id": 10, "method": "tools/call", "params": {
+    "name": "get_items", "arguments": {"project_id": "1", "sprint_id_or_backlog_id": "2"}
+}})
+_MALFORMED = b"invalid json"
+# Either status is a valid rejection of an unparseable body, depending on the FastAPI version
+_REJECTED_STATUSES = frozenset({400, 422})
+_MISSING_METHOD_PAYLOAD = orjson.dumps({"jsonrpc": "2.0", "id": 8, "params": {}})
 
+_EXPECTED_TOOLS = frozenset({
+    "get_projects", "get_project", "get_sprints", "get_sprint",
+    "get_items", "get_item", "get_epics", "get_epic"
+})
+
+# (method, params, check) rows; check receives the method's JSON-RPC response object
+CASES = [
+    ("initialize", INIT_PARAMS,
+     lambda r: {"protocolVersion", "capabilities", "serverInfo"} <= r["result"].keys()),
+    ("tools/list", {},
+     lambda r: "tools" in r["result"]),
+    ("invalid_method", {},
+     lambda r: r["error"]["code"] == -32601 and "Method not found" in r["error"]["message"]),
+]
+
+
+@pytest.fixture(scope="module")
+def mcp_batch(client, zoho_offline):
+    """Every CASES row plus a notification, sent as one batch; responses keyed by method."""
+    calls = [{"jsonrpc": "2.0", "id": method, "method": method, "params": params} for method, params, _ in CASES]
+    calls.append({"jsonrpc": "2.0", "method": "notifications/initialized", "params": {}})
+    return {entry["id"]: entry for entry in rpc_batch(client, orjson.dumps(calls))}
+
+
+@pytest.mark.xdist_group("streamable_http")
 class TestZohoSprintsStreamableHttpMCPServer:
     """Test suite for the Zoho Sprints StreamableHttp MCP server."""
     
-    @pytest.fixture
-    def base_url(self):
-        """Base URL for the StreamableHttp MCP server."""
-        return "http://localhost:8000"
-    
-    @pytest.fixture
-    def headers(self):
-        """Headers for MCP requests."""
-        return {
-            "Content-Type": "application/json"
-        }
-    
-    @pytest.fixture
-    def mock_zoho_credentials(self):
-        """Mock Zoho credentials for testing."""
-        os.environ["ZOHO_CLIENT_ID"] = "test_client_id"
-        os.environ["ZOHO_CLIENT_SECRET"] = "test_client_secret"
-        yield
-        # Clean up
-        if "ZOHO_CLIENT_ID" in os.environ:
-            del os.environ["ZOHO_CLIENT_ID"]
-        if "ZOHO_CLIENT_SECRET" in os.environ:
-            del os.environ["ZOHO_CLIENT_SECRET"]
-    
-    def test_root_endpoint(self, base_url):
+    def test_root_endpoint(self, client):
         """Test the root endpoint."""
-        response = requests.get(f"{base_url}/")
+        response = client.get("/")
         assert response.status_code == 200
         
-        data = response.json()
+        data = j(response)
         assert data["name"] == "zoho-sprints-mcp-server"
         assert data["version"] == "1.0.0"
         assert data["transport"] == "streamablehttp"
         assert data["framework"] == "fastapi"
         assert "endpoints" in data
     
-    def test_health_check(self, base_url):
+    def test_health_check(self, client):
         """Test the health check endpoint."""
-        response = requests.get(f"{base_url}/health")
+        response = client.get("/health")
         assert response.status_code == 200
         
-        data = response.json()
+        data = j(response)
         assert data["status"] == "healthy"
         assert data["transport"] == "streamablehttp"
         assert data["framework"] == "fastapi"
         assert data["service"] == "zoho-sprints"
     
-    def test_mcp_initialize(self, base_url, headers, mock_zoho_credentials):
-        """Test MCP initialize request."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "initialize",
-            "params": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {
-                    "name": "test-client",
-                    "version": "1.0.0"
-                }
-            }
-        }
-        
-        response = requests.post(f"{base_url}/mcp", json=request_data, headers=headers)
-        assert response.status_code == 200
-        
-        data = response.json()
+    @pytest.mark.parametrize("method,params,check", CASES, ids=[case[0] for case in CASES])
+    def test_mcp_method(self, mcp_batch, method, params, check):
+        """Test each table-driven MCP method against its batch response."""
+        data = mcp_batch[method]
         assert data["jsonrpc"] == "2.0"
-        assert data["id"] == 1
-        assert data.get("error") is None
-        assert "result" in data
+        assert data["id"] == method
+        assert check(data)
+    
+    def test_mcp_tools_list(self, mcp_batch):
+        """Test that tools/list advertises every Zoho Sprints tool."""
+        tools = mcp_batch["tools/list"]["result"]["tools"]
         
-        result = data["result"]
-        assert "protocolVersion" in result
-        assert "capabilities" in result
-        assert "serverInfo" in result
+        # Check that all expected Zoho Sprints tools are present
+        missing = _EXPECTED_TOOLS - {tool["name"] for tool in tools}
+        assert not missing, f"Missing tools: {sorted(missing)}"
     
-    def test_mcp_tools_list(self, base_url, headers):
-        """Test MCP tools/list request."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": 2,
-            "method": "tools/list",
-            "params": {}
-        }
+    def test_mcp_tools_call_on_another_worker(self, zoho_offline):
+        """Test that tools/call works on a worker that did not see initialize."""
+        # Two server instances stand in for two uvicorn worker processes
+        first_worker = TestClient(StreamableHttpMCPServer().app)
+        second_worker = TestClient(StreamableHttpMCPServer().app)
+        init_response = first_worker.post(MCP_URL, content=(_INIT_TEMPLATE % 4).encode(), headers=JSON_HEADERS)
+        assert "error" not in j(init_response)
         
-        response = requests.post(f"{base_url}/mcp", json=request_data, headers=headers)
+        response = second_worker.post(MCP_URL, content=_TOOLS_CALL_PAYLOAD, headers=JSON_HEADERS)
         assert response.status_code == 200
         
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == 2
-        assert data.get("error") is None
-        assert "result" in data
-        
-        result = data["result"]
-        assert "tools" in result
-        tools = result["tools"]
-        
-        # Check that all expected Zoho Sprints tools are present
-        expected_tools = [
-            "get_projects", "get_project", "get_sprints", "get_sprint",
-            "get_items", "get_item", "get_epics", "get_epic"
-        ]
-        
-        tool_names = [tool["name"] for tool in tools]
-        for expected_tool in expected_tools:
-            assert expected_tool in tool_names, f"Tool {expected_tool} not found"
+        data = j(response)
+        assert data["id"] == 3
+        assert "error" not in data
+        assert data["result"]["name"] == "get_projects"
     
-    def test_mcp_tools_call_before_initialize(self, base_url, headers):
-        """Test that tools/call fails before initialize."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": 3,
-            "method": "tools/call",
-            "params": {
-                "calls": [
-                    {
-                        "name": "get_projects",
-                        "arguments": {}
-                    }
-                ]
-            }
-        }
+    def test_mcp_tools_call_with_rejected_credentials(self, zoho_offline, monkeypatch):
+        """Test that tools/call reports an error when authentication with its credentials fails."""
+        async def rejected(service):
+            return False
         
-        response = requests.post(f"{base_url}/mcp", json=request_data, headers=headers)
+        monkeypatch.setattr(zoho_module.ZohoSprintsService, "authenticate", rejected)
+        # Credentials no earlier test has authenticated, so nothing is cached for them
+        url = MCP_URL.replace("client_id=test_client_id", "client_id=rejected_client_id")
+        response = TestClient(StreamableHttpMCPServer().app).post(url, content=_TOOLS_CALL_PAYLOAD, headers=JSON_HEADERS)
         assert response.status_code == 200
         
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
+        data = j(response)
         assert data["id"] == 3
-        assert "error" in data
         assert data["error"]["code"] == -32603
-        assert "Server not initialized" in data["error"]["message"]
+        assert "Authentication failed" in data["error"]["message"]
     
-    def test_mcp_tools_call_after_initialize(self, base_url, headers, mock_zoho_credentials):
-        """Test MCP tools/call request after initialization."""
-        # First initialize
-        init_request = {
-            "jsonrpc": "2.0",
-            "id": 4,
-            "method": "initialize",
-            "params": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {
-                    "name": "test-client",
-                    "version": "1.0.0"
-                }
-            }
-        }
+    def test_mcp_tools_call_uses_each_clients_credentials(self, zoho_offline, monkeypatch):
+        """Test that a client's tools/call is served with its own credentials, not the last initialized."""
+        async def fetch(service, url, default, revalidate, cache):
+            return [{"client_id": service.client_id}]
         
-        init_response = requests.post(f"{base_url}/mcp", json=init_request, headers=headers)
-        assert init_response.status_code == 200
+        monkeypatch.setattr(zoho_module.ZohoSprintsService, "_fetch", fetch)
+        client_a = MCP_URL.replace("client_id=test_client_id", "client_id=tenant_a")
+        client_b = MCP_URL.replace("client_id=test_client_id", "client_id=tenant_b")
+        shared = TestClient(StreamableHttpMCPServer().app)
+        init_payload = (_INIT_TEMPLATE % 4).encode()
+        shared.post(client_a, content=init_payload, headers=JSON_HEADERS)
+        shared.post(client_b, content=init_payload, headers=JSON_HEADERS)
         
-        # Then try to call a tool
-        tool_request = {
-            "jsonrpc": "2.0",
-            "id": 5,
-            "method": "tools/call",
-            "params": {
-                "calls": [
-                    {
-                        "name": "get_projects",
-                        "arguments": {}
-                    }
-                ]
-            }
-        }
-        
-        response = requests.post(f"{base_url}/mcp", json=tool_request, headers=headers)
+        data = j(shared.post(client_a, content=_TOOLS_CALL_PAYLOAD, headers=JSON_HEADERS))
+        text = data["result"]["content"][0]["text"]
+        assert "tenant_a" in text
+        assert "tenant_b" not in text
+    
+    def test_mcp_tools_call_after_initialize(self, client, zoho_offline):
+        """Test MCP tools/call request after initialization."""
+        # One round-trip; the server runs batch entries in order
+        resp = rpc_batch(client, _INIT_THEN_CALL_PAYLOAD)
+        assert resp[0]["id"] == 4 and resp[1]["id"] == 5
+        assert all(entry["jsonrpc"] == "2.0" for entry in resp)
+        assert "error" not in resp[1]
+        assert resp[1]["result"]["name"] == "get_projects"
+    
+    def test_mcp_notification_initialized(self, client, mcp_batch):
+        """Test MCP notifications/initialized request."""
+        response = client.post(MCP_URL, content=_NOTIFICATION_PAYLOAD, headers=JSON_HEADERS)
+        assert response.status_code == 202
+        assert response.content == b""
+        # Notifications get no entry in a batch response either
+        assert len(mcp_batch) == len(CASES)
+    
+    def test_mcp_malformed_request(self, client):
+        """Test MCP request with malformed JSON."""
+        response = client.post(MCP_URL, content=_MALFORMED, headers=JSON_HEADERS)
+        assert response.status_code in _REJECTED_STATUSES
+    
+    def test_mcp_missing_method(self, client):
+        """Test MCP request without method."""
+        response = client.post(MCP_URL, content=_MISSING_METHOD_PAYLOAD, headers=JSON_HEADERS)
+        assert response.status_code == 422  # FastAPI validation error
+    
+    def test_mcp_tools_call_multiple_calls(self, client, zoho_offline):
+        """Test that several tool calls in one tools/call come back in call order."""
+        response = client.post(MCP_URL, content=_MULTI_CALL_PAYLOAD, headers=JSON_HEADERS)
         assert response.status_code == 200
         
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == 5
-        # Note: This will likely fail due to invalid Zoho credentials in test environment
-        # but the MCP protocol should work correctly
+        data = j(response)
+        assert data["id"] == 9
+        calls = data["result"]["calls"]
+        assert [call["name"] for call in calls] == ["get_projects", "get_project", "get_epics"]
+        assert calls[1]["content"][0]["text"] == "Error: project_id is required"
+        assert not calls[0]["content"][0]["text"].startswith("Error")
+        assert not calls[2]["content"][0]["text"].startswith("Error")
     
-    def test_mcp_invalid_method(self, base_url, headers):
-        """Test MCP request with invalid method."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": 6,
-            "method": "invalid_method",
-            "params": {}
-        }
+    def test_large_tool_result_is_gzipped(self, client, zoho_offline, monkeypatch):
+        """Test that a large get_items result is gzip-compressed and a small reply is not."""
+        async def fetch(service, url, default, revalidate, cache):
+            return [{"id": str(i), "name": f"Item {i}", "status": "open"} for i in range(200)]
         
-        response = requests.post(f"{base_url}/mcp", json=request_data, headers=headers)
+        monkeypatch.setattr(zoho_module.ZohoSprintsService, "_fetch", fetch)
+        headers = {**JSON_HEADERS, "Accept-Encoding": "gzip"}
+        response = client.post(MCP_URL, content=_GET_ITEMS_PAYLOAD, headers=headers)
         assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert j(response)["result"]["name"] == "get_items"
         
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == 6
-        assert "error" in data
-        assert data["error"]["code"] == -32601
-        assert "Method not found" in data["error"]["message"]
+        small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
     
-    def test_mcp_notification_initialized(self, base_url, headers):
-        """Test MCP notifications/initialized request."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": 7,
-            "method": "notifications/initialized",
-            "params": {}
-        }
+    @pytest.mark.asyncio
+    async def test_failing_login_does_not_block_other_credentials(self, monkeypatch):
+        """Test that logins are deduplicated per credentials and never serialized across them."""
+        attempts = []
         
-        response = requests.post(f"{base_url}/mcp", json=request_data, headers=headers)
-        assert response.status_code == 200
+        async def authenticate(service):
+            attempts.append(service.client_id)
+            if service.client_id == "slow_bad_client":
+                await asyncio.sleep(0.3)
+                return False
+            service.access_token = "test_access_token"
+            return True
         
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == 7
-        assert data.get("error") is None
-    
-    def test_mcp_malformed_request(self, base_url, headers):
-        """Test MCP request with malformed JSON."""
-        response = requests.post(f"{base_url}/mcp", data="invalid json", headers=headers)
-        assert response.status_code == 422  # FastAPI validation error
-    
-    def test_mcp_missing_method(self, base_url, headers):
-        """Test MCP request without method."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": 8,
-            "params": {}
-        }
+        monkeypatch.setattr(zoho_module.ZohoSprintsService, "authenticate", authenticate)
+        credentials = dict(parse_qsl(MCP_URL.split("?", 1)[1]))
+        bad = {**credentials, "client_id": "slow_bad_client"}
+        good = {**credentials, "client_id": "fast_good_client"}
         
-        response = requests.post(f"{base_url}/mcp", json=request_data, headers=headers)
-        assert response.status_code == 422  # FastAPI validation error
+        async def timed_good_lookup():
+            await asyncio.sleep(0.01)
+            started = time.monotonic()
+            await server_module._get_zoho_service(good)
+            return time.monotonic() - started
+        
+        bad_first, bad_second, good_elapsed = await asyncio.gather(
+            server_module._get_zoho_service(bad),
+            server_module._get_zoho_service(bad),
+            timed_good_lookup(),
+            return_exceptions=True
+        )
+        
+        assert isinstance(bad_first, Exception) and isinstance(bad_second, Exception)
+        assert good_elapsed < 0.1
+        assert attempts.count("slow_bad_client") == 1
+        
+        # A recent failure is answered from the failure cache without another login
+        with pytest.raises(Exception, match="Failed to authenticate"):
+            await server_module._get_zoho_service(bad)
+        assert attempts.count("slow_bad_client") == 1
     
     def test_server_startup(self):
         """Test that the server can start up correctly."""
-        # This test verifies the server can be imported and instantiated
-        try:
-            from src.mcp_streamable_http_server import StreamableHttpMCPServer
-            server = StreamableHttpMCPServer(host="127.0.0.1", port=8001)
-            assert server.host == "127.0.0.1"
-            assert server.port == 8001
-            assert server.initialized is False
-            assert server.zoho_service is None
-        except ImportError:
-            pytest.skip("Cannot import MCP server - may be running in test environment")
-    
-    def test_zoho_service_import(self):
-        """Test that the Zoho Sprints service can be imported."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            # This will fail due to missing environment variables, but import should work
-            pytest.raises(ValueError, ZohoSprintsService)
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
+        # This test verifies the server can be instantiated
+        server = StreamableHttpMCPServer(host="127.0.0.1", port=8001)
+        assert server.host == "127.0.0.1"
+        assert server.port == 8001
     
     def test_config_settings_import(self):
         """Test that the configuration settings can be imported."""
-        try:
-            from src.config.settings import Settings
-            assert hasattr(Settings, 'ZOHO_CLIENT_ID')
-            assert hasattr(Settings, 'ZOHO_CLIENT_SECRET')
-            assert hasattr(Settings, 'ZOHO_AUTH_URL')
-            assert hasattr(Settings, 'ZOHO_SPRINTS_BASE_URL')
-        except ImportError:
-            pytest.skip("Cannot import config settings - may be running in test environment")
+        assert hasattr(Settings, 'ZOHO_CLIENT_ID')
+        assert hasattr(Settings, 'ZOHO_CLIENT_SECRET')
+        assert hasattr(Settings, 'ZOHO_AUTH_URL')
+        assert hasattr(Settings, 'ZOHO_SPRINTS_BASE_URL')
+
+
+@pytest.mark.live
+class TestLiveStreamableHttpMCPServer:
+    """Smoke tests against a running server; skipped unless pytest is run with --live."""
+    
+    def test_health_check(self):
+        """Test the health check endpoint of the running server."""
+        response = requests.get(f"{BASE_URL}/health", timeout=5)
+        assert response.status_code == 200
+        
+        data = j(response)
+        assert data["status"] == "healthy"
+        assert data["service"] == "zoho-sprints"
+    
+    def test_mcp_tools_list(self):
+        """Test that the running server advertises every Zoho Sprints tool."""
+        response = requests.post(
+            f"{BASE_URL}{MCP_URL}",
+            data=orjson.dumps({"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}}),
+            headers=JSON_HEADERS,
+            timeout=5
+        )
+        assert response.status_code == 200
+        
+        tools = j(response)["result"]["tools"]
+        assert not _EXPECTED_TOOLS - {tool["name"] for tool in tools}
 
 
 if __name__ == "__main__":
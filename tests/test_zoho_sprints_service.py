@@ -2,205 +2,380 @@
 Tests for the Zoho Sprints service.
 """
 
+import asyncio
+import re
+import threading
+import orjson
 import pytest
-import os
-from unittest.mock import patch, MagicMock
-import requests
+from types import MappingProxyType, SimpleNamespace
+import responses
+
+zoho_sprints = pytest.importorskip("src.services.zoho_sprints")
+ZohoSprintsService = zoho_sprints.ZohoSprintsService
+
+AUTH_URL = "https://accounts.zoho.com/oauth/v2/token"
+BASE_URL = "https://sprintsapi.zoho.com/zsapi/team"
+PROJECTS_URL = re.compile(r".*/projects/\?action=allprojects.*")
+AUTH_RESPONSE = {
+    "access_token": "test_access_token",
+    "refresh_token": "test_refresh_token",
+    "expires_in": 3600
+}
+PROJECTS_BODY = [{"id": "1", "name": "Test Project"}]
+PROJECT_URL = re.compile(r".*/projects/42/\?action=details")
+PROJECT_BODY = {"id": "42", "name": "Cached Project"}
+
+SERVICE_ARGS = {
+    "client_id": "test_client_id",
+    "client_secret": "test_client_secret",
+    "auth_url": AUTH_URL,
+    "base_url": BASE_URL,
+    "scopes": "ZohoSprints.projects.READ",
+}
 
 
 class TestZohoSprintsService:
     """Test suite for the Zoho Sprints service."""
     
+    @pytest.fixture(scope="session")
+    def mock_auth_response(self):
+        """Mock successful authentication response (read-only, shared by the session)."""
+        return MappingProxyType(AUTH_RESPONSE)
+    
     @pytest.fixture
-    def mock_credentials(self):
-        """Mock Zoho credentials for testing."""
-        os.environ["ZOHO_CLIENT_ID"] = "test_client_id"
-        os.environ["ZOHO_CLIENT_SECRET"] = "test_client_secret"
-        yield
-        # Clean up
-        if "ZOHO_CLIENT_ID" in os.environ:
-            del os.environ["ZOHO_CLIENT_ID"]
-        if "ZOHO_CLIENT_SECRET" in os.environ:
-            del os.environ["ZOHO_CLIENT_SECRET"]
+    def zoho_http(self, mock_auth_response):
+        """Serve canned Zoho token and projects responses; nothing reaches the network."""
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add(responses.POST, AUTH_URL, json=dict(mock_auth_response))
+            rsps.add(responses.GET, PROJECTS_URL, json=PROJECTS_BODY)
+            yield rsps
     
     @pytest.fixture
-    def mock_auth_response(self):
-        """Mock successful authentication response."""
-        return {
-            "access_token": "test_access_token",
-            "refresh_token": "test_refresh_token",
-            "expires_in": 3600
-        }
+    def authed_service(self, monkeypatch):
+        """A service that already holds a token and never re-authenticates."""
+        async def authenticated(*args):
+            return True
+        
+        monkeypatch.setattr(ZohoSprintsService, "authenticate", authenticated)
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        service.access_token = "test_token"
+        service.token_expires_at = None
+        monkeypatch.setattr(service, "_ensure_authenticated", authenticated)
+        return service
+    
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        """The service module's monotonic clock, pinned at 1000.0; tests advance clock.now."""
+        clock = SimpleNamespace(now=1000.0)
+        monkeypatch.setattr(zoho_sprints, "time", SimpleNamespace(monotonic=lambda: clock.now))
+        return clock
     
-    def test_service_initialization(self, mock_credentials):
+    @pytest.fixture
+    def pinned_service(self, clock):
+        """A service holding an old token, on the pinned clock."""
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        service.access_token = "old_token"
+        return service
+    
+    @pytest.fixture
+    def project_data(self, zoho_http):
+        """Serve distinct sprints and epics for projects 1 and 2."""
+        for project_id in ("1", "2"):
+            zoho_http.add(responses.GET, re.compile(rf".*/projects/{project_id}/sprints/\?action=data.*"),
+                          json={"sprints": [f"sprint-{project_id}"]})
+            zoho_http.add(responses.GET, re.compile(rf".*/projects/{project_id}/epic/\?action=data.*"),
+                          json={"epics": [f"epic-{project_id}"]})
+        return zoho_http
+    
+    def test_service_initialization(self):
         """Test that the service can be initialized with valid credentials."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            service = ZohoSprintsService()
-            assert service.client_id == "test_client_id"
-            assert service.client_secret == "test_client_secret"
-            assert service.access_token is None
-            assert service.refresh_token is None
-            assert service.token_expires_at is None
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        assert service.client_id == "test_client_id"
+        assert service.client_secret == "test_client_secret"
+        assert service.access_token is None
+        assert service.refresh_token is None
+        assert service.token_expires_at is None
     
     def test_service_initialization_missing_credentials(self):
         """Test that the service fails to initialize without credentials."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            with pytest.raises(ValueError, match="ZOHO_CLIENT_ID environment variable is required"):
-                ZohoSprintsService()
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    @patch('requests.post')
-    def test_successful_authentication(self, mock_post, mock_credentials, mock_auth_response):
+        with pytest.raises(TypeError, match="client_id"):
+            ZohoSprintsService()
+    
+    @pytest.mark.asyncio
+    async def test_successful_authentication(self, zoho_http):
         """Test successful authentication with Zoho."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            
-            # Mock successful response
-            mock_response = MagicMock()
-            mock_response.raise_for_status.return_value = None
-            mock_response.json.return_value = mock_auth_response
-            mock_post.return_value = mock_response
-            
-            service = ZohoSprintsService()
-            result = service.authenticate()
-            
-            assert result is True
-            assert service.access_token == "test_access_token"
-            assert service.refresh_token == "test_refresh_token"
-            assert service.token_expires_at is not None
-            
-            # Verify the request was made correctly
-            mock_post.assert_called_once()
-            call_args = mock_post.call_args
-            assert call_args[0][0] == "https://accounts.zoho.com/oauth/v2/token"
-            
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    @patch('requests.post')
-    def test_authentication_failure(self, mock_post, mock_credentials):
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        result = await service.authenticate()
+        
+        assert result is True
+        assert service.access_token == "test_access_token"
+        assert service.refresh_token == "test_refresh_token"
+        assert service.token_expires_at is not None
+        
+        # Verify the request was made correctly
+        assert len(zoho_http.calls) == 1
+        assert zoho_http.calls[0].request.url == AUTH_URL
+    
+    @pytest.mark.asyncio
+    async def test_authentication_failure(self, zoho_http):
         """Test authentication failure handling."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            
-            # Mock failed response
-            mock_post.side_effect = requests.exceptions.RequestException("Authentication failed")
-            
-            service = ZohoSprintsService()
-            result = service.authenticate()
-            
-            assert result is False
-            assert service.access_token is None
-            
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    def test_get_headers_without_token(self, mock_credentials):
+        # Token endpoint rejects the client; raise_for_status turns this into a RequestException
+        zoho_http.replace(responses.POST, AUTH_URL, status=401, json={"error": "invalid_client"})
+        
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        result = await service.authenticate()
+        
+        assert result is False
+        assert service.access_token is None
+    
+    def test_get_headers_without_token(self):
         """Test that get_headers fails without access token."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            
-            service = ZohoSprintsService()
-            with pytest.raises(ValueError, match="Not authenticated"):
-                service._get_headers()
-                
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    def test_get_headers_with_token(self, mock_credentials, mock_auth_response):
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        with pytest.raises(ValueError, match="Not authenticated"):
+            service._get_headers()
+    
+    def test_get_headers_with_token(self):
         """Test that get_headers returns correct headers with access token."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            
-            service = ZohoSprintsService()
-            service.access_token = "test_token"
-            
-            headers = service._get_headers()
-            assert headers["Authorization"] == "Bearer test_token"
-            assert headers["Content-Type"] == "application/json"
-            
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    def test_token_expiration_check(self, mock_credentials):
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        service.access_token = "test_token"
+        
+        headers = service._get_headers()
+        assert headers["Authorization"] == "Zoho-oauthtoken test_token"
+        assert headers["Content-Type"] == "application/json"
+        assert service._get_headers() is headers
+    
+    def test_token_expiration_check(self, monkeypatch):
         """Test token expiration checking."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            from datetime import datetime, timedelta
-            
-            service = ZohoSprintsService()
-            
-            # Test with no expiration time
-            assert service._is_token_expired() is True
-            
-            # Test with future expiration time
-            service.token_expires_at = datetime.now() + timedelta(hours=1)
-            assert service._is_token_expired() is False
-            
-            # Test with past expiration time
-            service.token_expires_at = datetime.now() - timedelta(hours=1)
-            assert service._is_token_expired() is True
-            
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    @patch('requests.get')
-    def test_get_projects_success(self, mock_get, mock_credentials, mock_auth_response):
+        # Pin the service's monotonic clock so deadlines never race the real one
+        now = 1000.0
+        monkeypatch.setattr(zoho_sprints, "time", SimpleNamespace(monotonic=lambda: now))
+        service = ZohoSprintsService(**SERVICE_ARGS)
+        
+        # Test with no expiration time
+        assert service._is_token_expired() is True
+        
+        # Test with future expiration time
+        service._token_expires_monotonic = now + 3600
+        assert service._is_token_expired() is False
+        
+        # Test with past expiration time
+        service._token_expires_monotonic = now - 3600
+        assert service._is_token_expired() is True
+        
+        # The deadline itself counts as expired
+        service._token_expires_monotonic = now
+        assert service._is_token_expired() is True
+    
+    @pytest.mark.asyncio
+    async def test_get_projects_success(self, zoho_http, authed_service):
         """Test successful projects retrieval."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            
-            # Mock authentication
-            with patch.object(ZohoSprintsService, 'authenticate', return_value=True):
-                service = ZohoSprintsService()
-                service.access_token = "test_token"
-                service.token_expires_at = None  # Force re-auth check
-                
-                # Mock successful projects response
-                mock_response = MagicMock()
-                mock_response.raise_for_status.return_value = None
-                mock_response.json.return_value = {"projects": [{"id": "1", "name": "Test Project"}]}
-                mock_get.return_value = mock_response
-                
-                # Mock _ensure_authenticated to return True
-                with patch.object(service, '_ensure_authenticated', return_value=True):
-                    projects = service.get_projects()
-                    
-                    assert len(projects) == 1
-                    assert projects[0]["id"] == "1"
-                    assert projects[0]["name"] == "Test Project"
-                    
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
-    
-    @patch('requests.get')
-    def test_get_projects_failure(self, mock_get, mock_credentials):
+        projects = await authed_service.get_projects()
+        
+        assert len(projects) == 1
+        assert projects[0]["id"] == "1"
+        assert projects[0]["name"] == "Test Project"
+    
+    @pytest.mark.asyncio
+    async def test_get_projects_failure(self, zoho_http, authed_service):
         """Test projects retrieval failure handling."""
-        try:
-            from src.services.zoho_sprints import ZohoSprintsService
-            
-            # Mock authentication
-            with patch.object(ZohoSprintsService, 'authenticate', return_value=True):
-                service = ZohoSprintsService()
-                service.access_token = "test_token"
-                service.token_expires_at = None  # Force re-auth check
-                
-                # Mock failed response
-                mock_get.side_effect = Exception("API Error")
-                
-                # Mock _ensure_authenticated to return True
-                with patch.object(service, '_ensure_authenticated', return_value=True):
-                    projects = service.get_projects()
-                    
-                    assert projects == []
-                    
-        except ImportError:
-            pytest.skip("Cannot import Zoho service - may be running in test environment")
+        # Projects endpoint raises instead of answering
+        zoho_http.replace(responses.GET, PROJECTS_URL, body=Exception("API Error"))
+        
+        projects = await authed_service.get_projects()
+        
+        assert projects == []
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_get_projects_share_one_request(self, zoho_http, authed_service):
+        """Test that concurrent identical GETs are served by one in-flight request."""
+        release = threading.Event()
+        
+        def slow_projects(request):
+            release.wait(5)
+            return 200, {}, orjson.dumps(PROJECTS_BODY)
+        
+        zoho_http.replace(responses.CallbackResponse(responses.GET, PROJECTS_URL, callback=slow_projects))
+        callers = [asyncio.create_task(authed_service.get_projects()) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*callers)
+        
+        assert len(zoho_http.calls) == 1
+        assert all(result == PROJECTS_BODY for result in results)
+        assert authed_service._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_request(self, zoho_http, authed_service):
+        """Test that cancelling one waiter leaves the shared fetch running for the others."""
+        release = threading.Event()
+        
+        def slow_projects(request):
+            release.wait(5)
+            return 200, {}, orjson.dumps(PROJECTS_BODY)
+        
+        zoho_http.replace(responses.CallbackResponse(responses.GET, PROJECTS_URL, callback=slow_projects))
+        callers = [asyncio.create_task(authed_service.get_projects()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        callers[0].cancel()
+        release.set()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await callers[0]
+        assert await callers[1] == PROJECTS_BODY
+        assert await callers[2] == PROJECTS_BODY
+        assert len(zoho_http.calls) == 1
+        assert authed_service._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_get_projects_revalidates_with_etag(self, zoho_http, authed_service):
+        """Test that a cached list is revalidated with If-None-Match and reused on 304."""
+        zoho_http.replace(responses.GET, PROJECTS_URL, json=PROJECTS_BODY, headers={"ETag": '"v1"'})
+        assert await authed_service.get_projects() == PROJECTS_BODY
+        
+        zoho_http.replace(responses.GET, PROJECTS_URL, status=304)
+        projects = await authed_service.get_projects()
+        
+        assert len(zoho_http.calls) == 2
+        assert "If-None-Match" not in zoho_http.calls[0].request.headers
+        assert zoho_http.calls[1].request.headers["If-None-Match"] == '"v1"'
+        assert projects == PROJECTS_BODY
+    
+    @pytest.mark.asyncio
+    async def test_get_projects_without_validators_is_not_cached(self, zoho_http, authed_service):
+        """Test that a response without ETag or Last-Modified is not kept for revalidation."""
+        await authed_service.get_projects()
+        await authed_service.get_projects()
+        
+        assert authed_service._response_cache.get(authed_service._projects_url) is None
+        assert len(zoho_http.calls) == 2
+        assert "If-None-Match" not in zoho_http.calls[1].request.headers
+        assert "If-Modified-Since" not in zoho_http.calls[1].request.headers
+    
+    @pytest.mark.asyncio
+    async def test_get_project_is_served_from_resource_cache(self, zoho_http, authed_service):
+        """Test that a repeated single-resource lookup makes one GET."""
+        zoho_http.add(responses.GET, PROJECT_URL, json=PROJECT_BODY)
+        
+        assert await authed_service.get_project("42") == PROJECT_BODY
+        assert await authed_service.get_project("42") == PROJECT_BODY
+        assert len(zoho_http.calls) == 1
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("first", [{"status": 404, "json": {"error": "not found"}}, {"json": {}}],
+                             ids=["failure", "empty_body"])
+    async def test_get_project_does_not_cache_failures_or_empty_bodies(self, zoho_http, authed_service, first):
+        """Test that failed or empty lookups are fetched again on the next call."""
+        zoho_http.add(responses.GET, PROJECT_URL, **first)
+        await authed_service.get_project("42")
+        
+        zoho_http.replace(responses.GET, PROJECT_URL, json=PROJECT_BODY)
+        
+        assert await authed_service.get_project("42") == PROJECT_BODY
+        assert len(zoho_http.calls) == 2
+    
+    @pytest.mark.asyncio
+    async def test_stale_token_refreshes_in_background(self, zoho_http, pinned_service):
+        """Test that a stale token is served at once while one background refresh runs."""
+        # Past the refresh buffer but not yet expired
+        pinned_service._token_refresh_monotonic = 999.0
+        pinned_service._token_expires_monotonic = 1100.0
+        
+        assert await pinned_service._ensure_authenticated() is True
+        refresh_task = pinned_service._refresh_task
+        assert refresh_task is not None
+        assert pinned_service.access_token == "old_token"
+        
+        # A second call inside the stale window reuses the pending refresh
+        assert await pinned_service._ensure_authenticated() is True
+        assert pinned_service._refresh_task is refresh_task
+        
+        assert await refresh_task is True
+        assert len(zoho_http.calls) == 1
+        assert zoho_http.calls[0].request.url == AUTH_URL
+        assert pinned_service.access_token == "test_access_token"
+    
+    @pytest.mark.asyncio
+    async def test_expired_token_blocks_on_refresh(self, zoho_http, pinned_service):
+        """Test that an expired token is replaced before _ensure_authenticated returns."""
+        pinned_service._token_refresh_monotonic = 900.0
+        pinned_service._token_expires_monotonic = 999.0
+        
+        assert await pinned_service._ensure_authenticated() is True
+        
+        assert pinned_service._refresh_task is None
+        assert len(zoho_http.calls) == 1
+        assert pinned_service.access_token == "test_access_token"
+    
+    @pytest.mark.asyncio
+    async def test_failed_background_refresh_backs_off(self, zoho_http, pinned_service, clock):
+        """Test that a failed background refresh is not retried until the cooldown passes."""
+        zoho_http.replace(responses.POST, AUTH_URL, status=401, json={"error": "invalid_client"})
+        pinned_service._token_refresh_monotonic = 999.0
+        pinned_service._token_expires_monotonic = 1100.0
+        
+        assert await pinned_service._ensure_authenticated() is True
+        assert await pinned_service._refresh_task is False
+        # The current token stays in use after the failure
+        assert pinned_service.access_token == "old_token"
+        assert pinned_service._get_headers()["Authorization"] == "Zoho-oauthtoken old_token"
+        
+        # Inside the cooldown no new refresh is started
+        failed_task = pinned_service._refresh_task
+        assert await pinned_service._ensure_authenticated() is True
+        assert pinned_service._refresh_task is failed_task
+        assert len(zoho_http.calls) == 1
+        
+        clock.now += zoho_sprints.REFRESH_RETRY_COOLDOWN
+        assert await pinned_service._ensure_authenticated() is True
+        await pinned_service._refresh_task
+        assert len(zoho_http.calls) == 2
+    
+    @pytest.mark.asyncio
+    async def test_token_response_without_access_token_keeps_old_token(self, zoho_http, pinned_service):
+        """Test that a token response without an access_token leaves the current token in place."""
+        zoho_http.replace(responses.POST, AUTH_URL, json={"error": "invalid_code"})
+        
+        assert await pinned_service.authenticate() is False
+        
+        assert pinned_service.access_token == "old_token"
+        assert pinned_service._get_headers()["Authorization"] == "Zoho-oauthtoken old_token"
+    
+    @pytest.mark.asyncio
+    async def test_get_sprints_for_projects_keeps_order(self, project_data, authed_service):
+        """Test that concurrent sprint fetches come back in project_ids order."""
+        sprints = await authed_service.get_sprints_for_projects(["2", "1"])
+        
+        assert sprints == [{"sprints": ["sprint-2"]}, {"sprints": ["sprint-1"]}]
+    
+    @pytest.mark.asyncio
+    async def test_get_project_snapshot(self, project_data, authed_service):
+        """Test that a snapshot combines a project's sprints and epics."""
+        snapshot = await authed_service.get_project_snapshot("1")
+        
+        assert snapshot == {
+            "project_id": "1",
+            "sprints": {"sprints": ["sprint-1"]},
+            "epics": {"epics": ["epic-1"]}
+        }
+    
+    @pytest.mark.asyncio
+    async def test_get_all_snapshots_follows_project_ids(self, project_data, authed_service):
+        """Test that every listed project gets a snapshot, in the order Zoho lists them."""
+        project_data.replace(responses.GET, PROJECTS_URL, json={"projectIds": ["2", "1"]})
+        
+        snapshots = await authed_service.get_all_snapshots()
+        
+        assert [snapshot["project_id"] for snapshot in snapshots] == ["2", "1"]
+        assert snapshots[0]["sprints"] == {"sprints": ["sprint-2"]}
+        assert snapshots[1]["epics"] == {"epics": ["epic-1"]}
+    
+    @pytest.mark.asyncio
+    async def test_get_all_snapshots_without_project_ids(self, project_data, authed_service):
+        """Test that a projects response without projectIds yields no snapshots."""
+        project_data.replace(responses.GET, PROJECTS_URL, json={"projects": []})
+        
+        assert await authed_service.get_all_snapshots() == []
+        assert len(project_data.calls) == 1
 
 
 if __name__ == "__main__":